@@ -23,7 +23,6 @@
 import copy
 import logging
 import os
-import pickle
 
 import rq
 
@@ -34,6 +33,7 @@ from .tasks import (ArchivingTaskConfig,
                     SchedulingTaskConfig,
                     TaskRegistry,
                     TaskStatus)
+from .utils import deserialize_item
 
 logger = logging.getLogger(__name__)
 
@@ -137,7 +137,7 @@ class Arthur:
         items = pipe.execute()[0]
 
         for item in items:
-            item = pickle.loads(item)
+            item = deserialize_item(item)
             yield item
 
     @staticmethod
@@ -36,3 +36,8 @@ TIMEOUT = 3600 * 24
 WAIT_FOR_QUEUING = 10  # In seconds
 
 MAX_JOB_RETRIES = 3
+
+ITEMS_BATCH_SIZE = 128
+ITEMS_FLUSH_INTERVAL = 0.25  # In seconds
+
+ITEMS_SERIALIZER = 'msgpack'
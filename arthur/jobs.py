@@ -20,9 +20,11 @@
 #     Alvaro del Castillo San Felix <acs@bitergia.com>
 #
 
+import collections
 import logging
+import threading
+import time
 
-import pickle
 import rq
 
 import perceval
@@ -31,12 +33,46 @@ import perceval.backends
 import perceval.archive
 
 from ._version import __version__
+from .common import (ITEMS_BATCH_SIZE,
+                     ITEMS_FLUSH_INTERVAL,
+                     ITEMS_SERIALIZER)
 from .errors import NotFoundError
+from .utils import item_serializer
 
 
 logger = logging.getLogger(__name__)
 
 
+# Perceval backends available, indexed by name
+_BACKENDS = None
+
+
+def find_backend_class(backend):
+    """Find the class of a Perceval backend.
+
+    Perceval backends are looked up only the first time this
+    function is called; the result is cached for the next calls.
+
+    :param backend: name of the backend
+
+    :returns: the backend class
+
+    :raises NotFoundError: raised when the backend is not available
+        in Perceval
+    """
+    global _BACKENDS
+
+    # Concurrent first calls would build the same mapping,
+    # so there is no need to lock it
+    if _BACKENDS is None:
+        _BACKENDS = perceval.backend.find_backends(perceval.backends)[0]
+
+    try:
+        return _BACKENDS[backend]
+    except KeyError:
+        raise NotFoundError(element=backend)
+
+
 class JobResult:
     """Class to store the result of a Perceval job.
 
@@ -58,6 +94,11 @@ class JobResult:
         self.category = category
         self.summary = None
 
+    def reset(self):
+        """Reset the outcome of the job stored in this object"""
+
+        self.summary = None
+
     def to_dict(self):
         """Convert object to a dict"""
 
@@ -100,11 +141,15 @@ class PercevalJob:
     :raises NotFoundError: raised when the backend is not available
         in Perceval
     """
+    __slots__ = ('job_id', 'job_number', 'task_id', 'backend',
+                 'category', 'conn', 'qitems', 'archive_manager',
+                 '_bklass', '_has_archiving', '_has_resuming',
+                 '_big', '_result')
+
     def __init__(self, job_id, job_number, task_id, backend, category, conn, qitems):
-        try:
-            self._bklass = perceval.backend.find_backends(perceval.backends)[0][backend]
-        except KeyError:
-            raise NotFoundError(element=backend)
+        self._bklass = find_backend_class(backend)
+        self._has_archiving = self._bklass.has_archiving()
+        self._has_resuming = self._bklass.has_resuming()
 
         self.job_id = job_id
         self.job_number = job_number
@@ -136,7 +181,8 @@ class PercevalJob:
         if archive_path:
             self.archive_manager = perceval.archive.ArchiveManager(archive_path)
 
-    def run(self, backend_args, archive_args=None):
+    def run(self, backend_args, archive_args=None, batch_size=ITEMS_BATCH_SIZE,
+            max_flush_interval=ITEMS_FLUSH_INTERVAL, serializer=ITEMS_SERIALIZER):
         """Run the backend with the given parameters.
 
         The method will run the backend assigned to this job,
@@ -144,6 +190,16 @@ class PercevalJob:
         status of the job, can be accessed through the property
         `result`.
 
+        Items are serialized with `serializer` (see
+        `arthur.utils.item_serializer`) and sent to the queue
+        by a separate thread, so new items can be fetched while
+        the previous ones are stored. They are sent in batches
+        of `batch_size` items with a single command. A batch is also
+        sent when its oldest item has waited `max_flush_interval`
+        seconds, so items generated slowly are not held back.
+        Pending items are always sent before leaving the method,
+        even when the job fails.
+
         When the parameter `fetch_from_archive` is set to `True`,
         items will be fetched from the archive assigned to this job.
 
@@ -152,30 +208,80 @@ class PercevalJob:
 
         :param backend_args: parameters used to un the backend
         :param archive_args: archive arguments
+        :param batch_size: number of items sent at once to the queue
+        :param max_flush_interval: maximum seconds an item waits to be sent
+        :param serializer: name of the serializer used to encode the items
+
+        :raises ValueError: when `batch_size` is lower than 1
         """
+        if batch_size < 1:
+            raise ValueError("'batch_size' must be greater than 0; %s given"
+                             % str(batch_size))
+
+        # Perceval adds some entries (i.e. 'category') to the
+        # arguments it receives, so the caller's dict is copied
         args = backend_args.copy()
 
         if archive_args:
             self.initialize_archive_manager(archive_args['archive_path'])
 
-        self._result = JobResult(self.job_id, self.job_number, self.task_id,
-                                 self.backend, self.category)
+        self._result.reset()
 
         self._big = self._create_items_generator(args, archive_args)
 
-        for item in self._big.items:
-            self._metadata(item)
-            self.conn.rpush(self.qitems, pickle.dumps(item))
+        # Metadata added in place to every item, such as the
+        # identifier of the job that generated it or the version
+        # of the system
+        version = __version__
+        job_id = self.job_id
+
+        writer = _ItemsWriter(self.conn, self.qitems,
+                              batch_size, max_flush_interval,
+                              item_serializer(serializer))
+        writer.start()
+
+        # Bind the names used on every iteration to locals
+        write = writer.write
+
+        try:
+            for item in self._big.items:
+                item['arthur_version'] = version
+                item['job_id'] = job_id
+                write(item)
+        finally:
+            # Store the pending items even when the job failed;
+            # they are already part of the result summary
+            writer.close()
+
+            if writer.error:
+                # Perceval adds the items to its summary before they
+                # are stored, so the summary of the stored ones is
+                # used instead to resume the job from the right point
+                self._set_stored_summary(writer.stored)
+
+        if writer.error:
+            raise writer.error
+
+    def _set_stored_summary(self, stored):
+        """Set the summary of the items stored in the queue as result"""
+
+        summary = self._big.summary
+
+        if summary:
+            stored.skipped = summary.skipped
+            stored.extras = summary.extras
+
+        self._result.summary = stored
 
     def has_archiving(self):
         """Returns if the job supports items archiving"""
 
-        return self._bklass.has_archiving()
+        return self._has_archiving
 
     def has_resuming(self):
         """Returns if the job can be resumed when it fails"""
 
-        return self._bklass.has_resuming()
+        return self._has_resuming
 
     def _create_items_generator(self, backend_args, archive_args):
         """Create a Perceval items generator.
@@ -203,21 +309,135 @@ class PercevalJob:
                                                       fetch_archive=fetch_archive,
                                                       archived_after=archived_after)
 
-    def _metadata(self, item):
-        """Add metadata to an item.
 
-        Method that adds in place metadata to Perceval items such as
-        the identifier of the job that generated it or the version of
-        the system.
+class _ItemsWriter(threading.Thread):
+    """Private class to store items in a Redis queue.
+
+    Items given to `write` are serialized and stored in the Redis
+    queue `qitems` by this thread, overlapping the storage of the
+    items with the generation of new ones. Items are sent in
+    batches of `batch_size` items using a single `RPUSH` command
+    for each batch. Pending items are also sent when the oldest
+    of them has waited more than `max_flush_interval` seconds.
+
+    Items are handed over to the thread through a shared deque
+    and the thread takes whole batches from it at once. Adding an
+    item only takes the lock when the thread has to be woken up,
+    which happens with the first pending item and with every item
+    once a batch is complete. Adding items blocks when the thread
+    falls behind by more than two batches.
 
-        :param item: an item generated by Perceval
+    When an error occurs storing the items, it is saved in the
+    attribute `error` and the next items are discarded. Call `close`
+    to send the pending items and to wait for the thread to finish.
+    The attribute `stored` keeps the summary of the items stored
+    in the queue, so a failed job can be resumed after them.
+
+    :param conn: connection with a Redis database
+    :param qitems: name of the queue where items will be stored
+    :param batch_size: number of items sent at once to the queue
+    :param max_flush_interval: maximum seconds an item waits to be sent
+    :param dumps: function to serialize the items
+    """
+    def __init__(self, conn, qitems, batch_size, max_flush_interval, dumps):
+        super().__init__()
+        self.conn = conn
+        self.qitems = qitems
+        self.batch_size = batch_size
+        self.max_flush_interval = max_flush_interval
+        self.error = None
+        self.stored = perceval.backend.Summary()
+
+        self._dumps = dumps
+        self._items = collections.deque()
+        self._max_items = 2 * batch_size
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def write(self, item):
+        """Add an item to be stored.
+
+        :raises Exception: the error raised when previous items
+            were stored, if any
         """
-        item['arthur_version'] = __version__
-        item['job_id'] = self.job_id
+        if self.error:
+            raise self.error
+
+        items = self._items
+        items.append(item)
+        nitems = len(items)
+
+        # The item is added before taking the lock and the thread
+        # checks the deque holding the lock before waiting, so
+        # either it finds the item or it is already waiting when
+        # it is notified. The thread only waits without timeout
+        # when the deque is empty, so the next item makes `nitems`
+        # equal to 1 and wakes it up. While it waits for a full
+        # batch, it is woken up once there are enough items; in
+        # any other case it wakes up when the deadline expires.
+        if nitems == 1 or nitems >= self.batch_size:
+            with self._cond:
+                self._cond.notify()
+
+                # The thread notifies after taking every batch,
+                # also after an error, when items are discarded
+                while len(items) >= self._max_items and not self.error:
+                    self._cond.wait()
+
+    def close(self):
+        """Send the pending items and wait for the thread to finish"""
+
+        # The flag is checked by the thread before every wait
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.join()
+
+    def run(self):
+        items = self._items
+
+        while True:
+            with self._cond:
+                while not items and not self._closed:
+                    self._cond.wait()
+
+                # Wait until the batch is complete or its
+                # oldest item has waited long enough
+                deadline = time.monotonic() + self.max_flush_interval
+
+                while len(items) < self.batch_size and not self._closed:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+
+                closed = self._closed
+                batch = [items.popleft() for _ in range(min(len(items), self.batch_size))]
+
+                # Wake up the writer if it is waiting for room
+                self._cond.notify()
+
+            if batch and not self.error:
+                try:
+                    self._flush([self._dumps(item) for item in batch])
+
+                    for item in batch:
+                        self.stored.update(item)
+                except Exception as e:
+                    self.error = e
+
+            if closed and not items:
+                break
+
+    def _flush(self, pending):
+        # A single command stores the whole batch
+        self.conn.rpush(self.qitems, *pending)
 
 
 def execute_perceval_job(backend, backend_args, qitems, task_id, job_number,
-                         category, archive_args=None):
+                         category, archive_args=None, batch_size=ITEMS_BATCH_SIZE,
+                         max_flush_interval=ITEMS_FLUSH_INTERVAL,
+                         serializer=ITEMS_SERIALIZER):
     """Execute a Perceval job on RQ.
 
     The items fetched during the process will be stored in a
@@ -237,6 +457,10 @@ def execute_perceval_job(backend, backend_args, qitems, task_id, job_number,
     :param job_number: human readable identifier for this job
     :param category: category of the items to retrieve
     :param archive_args: archive arguments
+    :param batch_size: number of items sent at once to the queue
+    :param max_flush_interval: maximum seconds an item waits to be sent
+    :param serializer: name of the serializer used to encode the items;
+        `msgpack` by default, `orjson` or `pickle`
 
     :returns: a `JobResult` instance
 
@@ -249,29 +473,37 @@ def execute_perceval_job(backend, backend_args, qitems, task_id, job_number,
     job = PercevalJob(rq_job.id, job_number, task_id, backend, category,
                       rq_job.connection, qitems)
 
-    logger.debug("Running job #%s (task: %s) (%s) (cat:%s)",
-                 job.job_id, task_id, backend, category)
+    debug = logger.isEnabledFor(logging.DEBUG)
+
+    if debug:
+        logger.debug("Running job #%s (task: %s) (%s) (cat:%s)",
+                     job.job_id, task_id, backend, category)
 
     if not job.has_archiving() and archive_args:
         raise AttributeError("archive attributes set but archive is not supported")
 
     try:
-        job.run(backend_args, archive_args=archive_args)
+        job.run(backend_args, archive_args=archive_args,
+                batch_size=batch_size,
+                max_flush_interval=max_flush_interval,
+                serializer=serializer)
     except AttributeError as e:
         raise e
     except Exception as e:
         rq_job = rq.get_current_job()
         rq_job.meta['result'] = job.result
         rq_job.save_meta()
-        logger.debug("Error running job %s (%s) - %s",
-                     job.job_id, backend, str(e))
+        if debug:
+            logger.debug("Error running job %s (%s) - %s",
+                         job.job_id, backend, str(e))
         raise e
 
     result = job.result
 
-    logger.debug("Job #%s (task: %s) completed (%s) - %s/%s items (%s) fetched",
-                 result.job_id, task_id, result.backend,
-                 str(result.summary.fetched), str(result.summary.skipped),
-                 result.category)
+    if debug:
+        logger.debug("Job #%s (task: %s) completed (%s) - %s/%s items (%s) fetched",
+                     result.job_id, task_id, result.backend,
+                     str(result.summary.fetched), str(result.summary.skipped),
+                     result.category)
 
     return result
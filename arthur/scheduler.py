@@ -33,6 +33,9 @@ import rq
 import rq.job
 
 from .common import (CH_PUBSUB,
+                     ITEMS_BATCH_SIZE,
+                     ITEMS_FLUSH_INTERVAL,
+                     ITEMS_SERIALIZER,
                      Q_ARCHIVE_JOBS,
                      Q_CREATION_JOBS,
                      Q_RETRYING_JOBS,
@@ -568,4 +571,16 @@ def _build_job_arguments(task):
     archiving_cfg = task.archiving_cfg
     job_args['archive_args'] = archiving_cfg.to_dict() if archiving_cfg else None
 
+    # Scheduling parameters
+    scheduling_cfg = task.scheduling_cfg
+
+    if scheduling_cfg:
+        job_args['batch_size'] = scheduling_cfg.batch_size
+        job_args['max_flush_interval'] = scheduling_cfg.max_flush_interval
+        job_args['serializer'] = scheduling_cfg.serializer
+    else:
+        job_args['batch_size'] = ITEMS_BATCH_SIZE
+        job_args['max_flush_interval'] = ITEMS_FLUSH_INTERVAL
+        job_args['serializer'] = ITEMS_SERIALIZER
+
     return job_args
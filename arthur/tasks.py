@@ -35,14 +35,16 @@ from grimoirelab_toolkit.datetime import (InvalidDateError,
                                           str_to_datetime)
 from grimoirelab_toolkit.introspect import find_class_properties
 
-import perceval.backend
-import perceval.backends
-
-from .common import MAX_JOB_RETRIES, WAIT_FOR_QUEUING
+from .common import (ITEMS_BATCH_SIZE,
+                     ITEMS_FLUSH_INTERVAL,
+                     ITEMS_SERIALIZER,
+                     MAX_JOB_RETRIES,
+                     WAIT_FOR_QUEUING)
 from .errors import (AlreadyExistsError,
                      NotFoundError,
                      TaskRegistryError)
-from .utils import RWLock
+from .jobs import find_backend_class
+from .utils import ITEMS_SERIALIZERS, RWLock
 
 
 logger = logging.getLogger(__name__)
@@ -105,10 +107,7 @@ class Task:
     """
     def __init__(self, task_id, backend, category, backend_args,
                  archiving_cfg=None, scheduling_cfg=None):
-        try:
-            bklass = perceval.backend.find_backends(perceval.backends)[0][backend]
-        except KeyError:
-            raise NotFoundError(element=backend)
+        bklass = find_backend_class(backend)
 
         self._task_id = task_id
         self._has_resuming = bklass.has_resuming()
@@ -506,17 +505,42 @@ class SchedulingTaskConfig(_TaskConfig):
     task will run. Set it to `None` to let the scheduler decide
     what the best queue is.
 
+    The `batch_size` option sets the number of items the jobs of
+    this task will send together to the storage queue. Pending
+    items are also sent when the oldest of them has waited the
+    number of seconds set in `max_flush_interval`, so slow
+    backends do not delay them.
+
+    The `serializer` option sets the format of the items stored
+    in the queue: `msgpack`, `orjson` or `pickle`.
+
     :param delay: seconds of delay
     :param max_retries: maximum number of job retries before failing
     :param max_age: maximum number of times the task can run in the scheduler
     :param queue: name of the queue to run this task
+    :param batch_size: number of items stored at once in the items queue
+    :param max_flush_interval: maximum seconds an item waits to be sent
+    :param serializer: name of the serializer used to store the items
     """
     def __init__(self, delay=WAIT_FOR_QUEUING, max_retries=MAX_JOB_RETRIES,
-                 max_age=None, queue=None):
+                 max_age=None, queue=None, batch_size=ITEMS_BATCH_SIZE,
+                 max_flush_interval=ITEMS_FLUSH_INTERVAL,
+                 serializer=ITEMS_SERIALIZER):
         self.delay = delay
         self.max_retries = max_retries
         self.max_age = max_age
         self.queue = queue
+        self.batch_size = batch_size
+        self.max_flush_interval = max_flush_interval
+        self.serializer = serializer
+
+    def __setstate__(self, state):
+        # Configurations stored by previous versions do not
+        # have the options to send items; use the defaults
+        self._batch_size = ITEMS_BATCH_SIZE
+        self._max_flush_interval = ITEMS_FLUSH_INTERVAL
+        self._serializer = ITEMS_SERIALIZER
+        self.__dict__.update(state)
 
     @property
     def delay(self):
@@ -573,3 +597,44 @@ class SchedulingTaskConfig(_TaskConfig):
             if not isinstance(value, str):
                 raise ValueError("'queue' must be a str; %s given" % str(type(value)))
         self._queue = value
+
+    @property
+    def batch_size(self):
+        """Number of items stored at once in the items queue."""
+
+        return self._batch_size
+
+    @batch_size.setter
+    def batch_size(self, value):
+        if not isinstance(value, int):
+            raise ValueError("'batch_size' must be an int; %s given" % str(type(value)))
+        elif value < 1:
+            raise ValueError("'batch_size' must have a positive value; %s given" % str(value))
+        self._batch_size = value
+
+    @property
+    def max_flush_interval(self):
+        """Maximum number of seconds an item waits to be sent to the items queue."""
+
+        return self._max_flush_interval
+
+    @max_flush_interval.setter
+    def max_flush_interval(self, value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError("'max_flush_interval' must be a number; %s given" % str(type(value)))
+        elif value < 0:
+            raise ValueError("'max_flush_interval' must not be negative; %s given" % str(value))
+        self._max_flush_interval = value
+
+    @property
+    def serializer(self):
+        """Name of the serializer used to store the items in the items queue."""
+
+        return self._serializer
+
+    @serializer.setter
+    def serializer(self, value):
+        if value not in ITEMS_SERIALIZERS:
+            raise ValueError("'serializer' must be one of %s; %s given"
+                             % (', '.join(ITEMS_SERIALIZERS), str(value)))
+        self._serializer = value
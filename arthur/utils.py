@@ -22,8 +22,28 @@
 
 import datetime
 import json
+import logging
+import pickle
 import threading
 
+import msgpack
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# Serializers available to store items
+ITEMS_SERIALIZERS = ('msgpack', 'orjson', 'pickle')
+
+# Pickle protocol used to serialize items; protocol 5 is not
+# available on every supported Python version
+ITEMS_PICKLE_PROTOCOL = 4
+
 
 class RWLock:
     """Read Write lock to avoid starvation.
@@ -89,3 +109,83 @@ class JSONEncoder(json.JSONEncoder):
     def iterencode(self, o, _one_shot=False):
         for chunk in super().iterencode(o, _one_shot=_one_shot):
             yield chunk
+
+
+def item_serializer(serializer='msgpack'):
+    """Get a function to serialize items for the items queue.
+
+    Items can be serialized using `msgpack`, `orjson` or `pickle`.
+    `msgpack` produces smaller payloads and it is faster than
+    `pickle`, but only supports plain types (dicts, lists, strings,
+    64-bit integers and timezone aware datetimes). Items with other
+    types are pickled instead.
+
+    `orjson` encodes items as JSON, which is usually the fastest
+    option. Datetimes are encoded as RFC 3339 strings, taking naive
+    ones as UTC, so they are read back as strings. Items with types
+    that cannot be encoded as JSON are pickled instead. This
+    serializer requires the package `orjson`; when it is not
+    installed, `msgpack` is used instead.
+
+    The returned function can be called once per item. When
+    `msgpack` is selected, the same packer is reused for all
+    of them, so the function must not be shared between threads.
+
+    :param serializer: name of the serializer to use
+
+    :returns: a function that serializes an item
+
+    :raises ValueError: when the serializer is not supported
+    """
+    if serializer == 'orjson' and not orjson:
+        logger.warning("'orjson' serializer is not available; orjson package not found; "
+                       "using 'msgpack' instead")
+        serializer = 'msgpack'
+
+    if serializer == 'msgpack':
+        packer = msgpack.Packer(use_bin_type=True, datetime=True)
+
+        def dumps(item):
+            try:
+                return packer.pack(item)
+            except (TypeError, ValueError, OverflowError):
+                return pickle.dumps(item, protocol=ITEMS_PICKLE_PROTOCOL)
+        return dumps
+    elif serializer == 'pickle':
+        def dumps(item):
+            return pickle.dumps(item, protocol=ITEMS_PICKLE_PROTOCOL)
+        return dumps
+    elif serializer == 'orjson':
+        def dumps(item):
+            try:
+                return orjson.dumps(item, option=orjson.OPT_NAIVE_UTC)
+            except orjson.JSONEncodeError:
+                return pickle.dumps(item, protocol=ITEMS_PICKLE_PROTOCOL)
+        return dumps
+    else:
+        raise ValueError("unknown '%s' serializer" % serializer)
+
+
+def deserialize_item(data):
+    """Deserialize an item stored in the items queue.
+
+    The format of the data is guessed from its first byte,
+    so items serialized with any of the formats supported
+    by `item_serializer` can be read from the same queue.
+    Pickle streams always start with the `PROTO` opcode
+    (`0x80`), which in msgpack is a complete empty map. JSON
+    items start with `{`, which in msgpack is a complete integer.
+    JSON items are decoded with the `json` module when `orjson`
+    is not installed.
+
+    :param data: serialized item
+
+    :returns: the item
+    """
+    if len(data) > 1 and data[0] == 0x80:
+        return pickle.loads(data)
+    elif data[:1] == b'{':
+        return orjson.loads(data) if orjson else json.loads(data)
+    else:
+        return msgpack.unpackb(data, raw=False, timestamp=3,
+                               strict_map_key=False)
@@ -88,11 +88,15 @@ setup(name="kingarthur",
           'python-dateutil>=2.8.0',
           'redis==3.0.0',
           'rq==1.0.0',
+          'msgpack>=1.0.0',
           'cheroot>=8.2.1',
           'cherrypy>=17.4.2',
           'perceval>=0.12.23',
           'grimoirelab-toolkit>=0.1.10'
       ],
+      extras_require={
+          'orjson': ['orjson>=3.0.0']
+      },
       tests_require=['httpretty==0.8.6', 'fakeredis'],
       test_suite='tests',
       entry_points={
@@ -26,10 +26,14 @@ import os.path
 import pickle
 import shutil
 import tempfile
+import time
 import unittest
+import unittest.mock
 
 import httpretty
+import redis
 import requests
+import perceval.backend
 import rq
 from dateutil.tz import UTC
 
@@ -37,9 +41,13 @@ from arthur import __version__
 from arthur.errors import NotFoundError
 from arthur.jobs import (JobResult,
                          PercevalJob,
-                         execute_perceval_job)
+                         _ItemsWriter,
+                         execute_perceval_job,
+                         find_backend_class)
+from arthur.utils import deserialize_item, item_serializer
 from grimoirelab_toolkit.datetime import datetime_utcnow
 from perceval.archive import ArchiveManager
+from perceval.backends.core.git import Git
 
 from base import TestBaseRQ
 
@@ -198,6 +206,40 @@ def setup_mock_redmine_server(max_failures=0):
     return http_requests
 
 
+class TestFindBackendClass(unittest.TestCase):
+    """Unit tests for find_backend_class function"""
+
+    def test_find_backend_class(self):
+        """Test whether the class of a backend is returned"""
+
+        bklass = find_backend_class('git')
+        self.assertEqual(bklass, Git)
+
+    def test_backend_not_found(self):
+        """Test if it raises an exception when a backend is not found"""
+
+        with self.assertRaises(NotFoundError) as e:
+            _ = find_backend_class('mock_backend')
+
+        self.assertEqual(e.exception.element, 'mock_backend')
+
+    @unittest.mock.patch('arthur.jobs._BACKENDS', None)
+    def test_backends_cached(self):
+        """Test whether Perceval backends are only looked up once"""
+
+        find_backends = perceval.backend.find_backends
+
+        with unittest.mock.patch('perceval.backend.find_backends',
+                                 wraps=find_backends) as mock_find:
+            _ = find_backend_class('git')
+            _ = find_backend_class('git')
+
+            with self.assertRaises(NotFoundError):
+                _ = find_backend_class('mock_backend')
+
+        self.assertEqual(mock_find.call_count, 1)
+
+
 class TestJobResult(unittest.TestCase):
     """Unit tests for JobResult class"""
 
@@ -227,6 +269,49 @@ class TestJobResult(unittest.TestCase):
         d = result.to_dict()
         self.assertEqual(d, expected)
 
+    def test_reset(self):
+        """Test whether the summary is removed when the result is reset"""
+
+        result = JobResult('1234567890', 8, 'mytask',
+                           'mock_backend', 'category')
+        result.summary = unittest.mock.Mock()
+
+        result.reset()
+
+        self.assertEqual(result.job_id, '1234567890')
+        self.assertEqual(result.job_number, 8)
+        self.assertEqual(result.task_id, 'mytask')
+        self.assertEqual(result.backend, 'mock_backend')
+        self.assertEqual(result.category, 'category')
+        self.assertEqual(result.summary, None)
+
+    def test_pickle(self):
+        """Test whether a JobResult object can be pickled and unpickled"""
+
+        result = JobResult('1234567890', 8, 'mytask',
+                           'mock_backend', 'category')
+
+        # The state is pickled as a dict, as previous versions
+        # did, so results stored by any of them can be loaded
+        state = result.__reduce_ex__(pickle.HIGHEST_PROTOCOL)[2]
+        self.assertDictEqual(state, {
+            'job_id': '1234567890',
+            'job_number': 8,
+            'task_id': 'mytask',
+            'backend': 'mock_backend',
+            'category': 'category',
+            'summary': None
+        })
+
+        result = pickle.loads(pickle.dumps(result))
+
+        self.assertEqual(result.job_id, '1234567890')
+        self.assertEqual(result.job_number, 8)
+        self.assertEqual(result.task_id, 'mytask')
+        self.assertEqual(result.backend, 'mock_backend')
+        self.assertEqual(result.category, 'category')
+        self.assertEqual(result.summary, None)
+
 
 class TestPercevalJob(TestBaseRQ):
     """Unit tests for PercevalJob class"""
@@ -263,6 +348,28 @@ class TestPercevalJob(TestBaseRQ):
         self.assertEqual(job.category, 'commit')
         self.assertEqual(result.summary, None)
 
+    def test_has_archiving(self):
+        """Test if it returns whether the backend supports archiving"""
+
+        job = PercevalJob('1234567890', 8, 'mytask', 'git', 'commit',
+                          self.conn, 'items')
+        self.assertEqual(job.has_archiving(), False)
+
+        job = PercevalJob('1234567890', 8, 'mytask', 'bugzilla', 'bug',
+                          self.conn, 'items')
+        self.assertEqual(job.has_archiving(), True)
+
+    def test_has_resuming(self):
+        """Test if it returns whether the backend can be resumed"""
+
+        job = PercevalJob('1234567890', 8, 'mytask', 'git', 'commit',
+                          self.conn, 'items')
+        self.assertEqual(job.has_resuming(), True)
+
+        job = PercevalJob('1234567890', 8, 'mytask', 'jenkins', 'build',
+                          self.conn, 'items')
+        self.assertEqual(job.has_resuming(), False)
+
     def test_backend_not_found(self):
         """Test if it raises an exception when a backend is not found"""
 
@@ -306,7 +413,7 @@ class TestPercevalJob(TestBaseRQ):
         self.assertEqual(result.summary.last_offset, None)
 
         commits = self.conn.lrange('items', 0, -1)
-        commits = [pickle.loads(c) for c in commits]
+        commits = [deserialize_item(c) for c in commits]
         commits = [commit['data']['commit'] for commit in commits]
 
         expected = ['456a68ee1407a77f3e804a30dff245bb6c6b872f',
@@ -321,6 +428,191 @@ class TestPercevalJob(TestBaseRQ):
 
         self.assertEqual(commits, expected)
 
+    def test_run_backend_args_not_modified(self):
+        """Test whether the given backend arguments are not modified"""
+
+        job = PercevalJob('1234567890', 8, 'mytask',
+                          'git', 'commit',
+                          self.conn, 'items')
+        args = {
+            'uri': 'http://example.com/',
+            'gitpath': os.path.join(self.dir, 'data/git_log.txt')
+        }
+        expected = dict(args)
+
+        job.run(args)
+
+        self.assertDictEqual(args, expected)
+
+    def test_run_batch_size(self):
+        """Test whether items are stored in order when they are sent in batches"""
+
+        job = PercevalJob('1234567890', 8, 'mytask',
+                          'git', 'commit',
+                          self.conn, 'items')
+        args = {
+            'uri': 'http://example.com/',
+            'gitpath': os.path.join(self.dir, 'data/git_log.txt')
+        }
+
+        with unittest.mock.patch.object(self.conn, 'rpush',
+                                        wraps=self.conn.rpush) as mock_rpush:
+            job.run(args, batch_size=2)
+
+        # Four full batches and the last item
+        self.assertEqual(mock_rpush.call_count, 5)
+
+        result = job.result
+        self.assertEqual(result.summary.fetched, 9)
+
+        commits = self.conn.lrange('items', 0, -1)
+        commits = [deserialize_item(c) for c in commits]
+        commits = [commit['data']['commit'] for commit in commits]
+
+        expected = ['456a68ee1407a77f3e804a30dff245bb6c6b872f',
+                    '51a3b654f252210572297f47597b31527c475fb8',
+                    'ce8e0b86a1e9877f42fe9453ede418519115f367',
+                    '589bb080f059834829a2a5955bebfd7c2baa110a',
+                    'c6ba8f7a1058db3e6b4bc6f1090e932b107605fb',
+                    'c0d66f92a95e31c77be08dc9d0f11a16715d1885',
+                    '7debcf8a2f57f86663809c58b5c07a398be7674c',
+                    '87783129c3f00d2c81a3a8e585eb86a47e39891a',
+                    'bc57a9209f096a130dcc5ba7089a8663f758a703']
+
+        self.assertEqual(commits, expected)
+
+    def test_run_invalid_batch_size(self):
+        """Test whether an exception is raised when the batch size is not valid"""
+
+        job = PercevalJob('1234567890', 8, 'mytask',
+                          'git', 'commit',
+                          self.conn, 'items')
+        args = {
+            'uri': 'http://example.com/',
+            'gitpath': os.path.join(self.dir, 'data/git_log.txt')
+        }
+
+        for batch_size in [0, -1]:
+            with self.assertRaisesRegex(ValueError, "'batch_size' must be greater than 0"):
+                job.run(args, batch_size=batch_size)
+
+        commits = self.conn.lrange('items', 0, -1)
+        self.assertEqual(len(commits), 0)
+
+    def test_run_max_flush_interval(self):
+        """Test whether pending items are sent when the flush interval expires"""
+
+        job = PercevalJob('1234567890', 8, 'mytask',
+                          'git', 'commit',
+                          self.conn, 'items')
+        args = {
+            'uri': 'http://example.com/',
+            'gitpath': os.path.join(self.dir, 'data/git_log.txt')
+        }
+
+        conn = self.conn
+        write = _ItemsWriter.write
+
+        def write_and_wait(writer, item):
+            # Wait until the item is stored before generating the
+            # next one; the batch is never full so it only happens
+            # when the flush interval expires
+            nitems = conn.llen('items') + 1
+            write(writer, item)
+
+            timeout = time.monotonic() + 5
+            while conn.llen('items') < nitems:
+                self.assertLess(time.monotonic(), timeout)
+                time.sleep(0.001)
+
+        with unittest.mock.patch.object(self.conn, 'rpush',
+                                        wraps=self.conn.rpush) as mock_rpush:
+            with unittest.mock.patch.object(_ItemsWriter, 'write', write_and_wait):
+                job.run(args, batch_size=100, max_flush_interval=0)
+
+        # Items do not wait, so every item is sent on its own
+        self.assertEqual(mock_rpush.call_count, 9)
+
+        commits = self.conn.lrange('items', 0, -1)
+        self.assertEqual(len(commits), 9)
+
+    def test_run_storage_error(self):
+        """Test whether errors storing the items are raised"""
+
+        job = PercevalJob('1234567890', 8, 'mytask',
+                          'git', 'commit',
+                          self.conn, 'items')
+        args = {
+            'uri': 'http://example.com/',
+            'gitpath': os.path.join(self.dir, 'data/git_log.txt')
+        }
+
+        with unittest.mock.patch.object(self.conn, 'rpush',
+                                        side_effect=redis.exceptions.ConnectionError):
+            with self.assertRaises(redis.exceptions.ConnectionError):
+                job.run(args, batch_size=1)
+
+        commits = self.conn.lrange('items', 0, -1)
+        self.assertEqual(len(commits), 0)
+
+    def test_run_storage_error_summary(self):
+        """Test whether the summary only includes stored items after a storage error"""
+
+        job = PercevalJob('1234567890', 8, 'mytask',
+                          'git', 'commit',
+                          self.conn, 'items')
+        args = {
+            'uri': 'http://example.com/',
+            'gitpath': os.path.join(self.dir, 'data/git_log.txt')
+        }
+
+        flush = _ItemsWriter._flush
+        nflushes = 0
+
+        def fail_third_flush(writer, *args):
+            nonlocal nflushes
+            nflushes += 1
+            if nflushes == 3:
+                raise redis.exceptions.ConnectionError
+            return flush(writer, *args)
+
+        with unittest.mock.patch.object(_ItemsWriter, '_flush', fail_third_flush):
+            with self.assertRaises(redis.exceptions.ConnectionError):
+                job.run(args, batch_size=2)
+
+        # Only the first two batches were stored
+        items = [deserialize_item(item) for item in self.conn.lrange('items', 0, -1)]
+        self.assertEqual(len(items), 4)
+
+        max_updated_on = max(item['updated_on'] for item in items)
+
+        summary = job.result.summary
+        self.assertEqual(summary.fetched, 4)
+        self.assertEqual(summary.last_uuid, items[-1]['uuid'])
+        self.assertEqual(summary.max_updated_on.timestamp(), max_updated_on)
+        self.assertEqual(summary.skipped, 0)
+
+    def test_run_pickle_serializer(self):
+        """Test whether items are serialized with pickle when it is set"""
+
+        job = PercevalJob('1234567890', 8, 'mytask',
+                          'git', 'commit',
+                          self.conn, 'items')
+        args = {
+            'uri': 'http://example.com/',
+            'gitpath': os.path.join(self.dir, 'data/git_log.txt')
+        }
+
+        job.run(args, serializer='pickle')
+
+        commits = self.conn.lrange('items', 0, -1)
+        commits = [pickle.loads(c) for c in commits]
+        commits = [commit['data']['commit'] for commit in commits]
+
+        self.assertEqual(len(commits), 9)
+        self.assertEqual(commits[0], '456a68ee1407a77f3e804a30dff245bb6c6b872f')
+        self.assertEqual(commits[-1], 'bc57a9209f096a130dcc5ba7089a8663f758a703')
+
     def test_metadata(self):
         """Check if metadata parameters are correctly set"""
 
@@ -339,7 +631,7 @@ class TestPercevalJob(TestBaseRQ):
         job.run(args, archive_args)
 
         items = self.conn.lrange('items', 0, -1)
-        items = [pickle.loads(item) for item in items]
+        items = [deserialize_item(item) for item in items]
 
         for item in items:
             self.assertEqual(item['arthur_version'], __version__)
@@ -394,7 +686,7 @@ class TestPercevalJob(TestBaseRQ):
         job.run(args, archive_args=archive_args)
 
         bugs = self.conn.lrange('items', 0, -1)
-        bugs = [pickle.loads(b) for b in bugs]
+        bugs = [deserialize_item(b) for b in bugs]
         bugs = [bug['uuid'] for bug in bugs]
         self.conn.ltrim('items', 1, 0)
 
@@ -426,7 +718,7 @@ class TestPercevalJob(TestBaseRQ):
         job_archive.run(args, archive_args=archive_args)
 
         archived_bugs = self.conn.lrange('items', 0, -1)
-        archived_bugs = [pickle.loads(b) for b in archived_bugs]
+        archived_bugs = [deserialize_item(b) for b in archived_bugs]
         archived_bugs = [bug['uuid'] for bug in archived_bugs]
         self.conn.ltrim('items', 1, 0)
 
@@ -470,6 +762,60 @@ class TestPercevalJob(TestBaseRQ):
             job.initialize_archive_manager("")
 
 
+class TestItemsWriter(TestBaseRQ):
+    """Unit tests for _ItemsWriter class"""
+
+    def setUp(self):
+        super().setUp()
+        self.items = [
+            {'uuid': str(i), 'updated_on': 1344965413.0 + i, 'offset': i}
+            for i in range(1000)
+        ]
+
+    def test_write(self):
+        """Test whether all the items are stored in order"""
+
+        writer = _ItemsWriter(self.conn, 'items', 4, 60, item_serializer())
+        writer.start()
+
+        for item in self.items:
+            writer.write(item)
+        writer.close()
+
+        self.assertIsNone(writer.error)
+        self.assertFalse(writer.is_alive())
+
+        items = [deserialize_item(item) for item in self.conn.lrange('items', 0, -1)]
+        self.assertListEqual(items, self.items)
+
+        # The summary includes all the stored items
+        self.assertEqual(writer.stored.fetched, 1000)
+        self.assertEqual(writer.stored.last_uuid, '999')
+        self.assertEqual(writer.stored.max_offset, 999)
+
+    def test_write_error(self):
+        """Test whether items are discarded after an error"""
+
+        writer = _ItemsWriter(self.conn, 'items', 4, 60, item_serializer())
+
+        with unittest.mock.patch.object(writer, '_flush',
+                                        side_effect=redis.exceptions.ResponseError) as mock_flush:
+            writer.start()
+
+            with self.assertRaises(redis.exceptions.ResponseError):
+                for item in self.items:
+                    writer.write(item)
+            writer.close()
+
+        self.assertEqual(mock_flush.call_count, 1)
+        self.assertIsInstance(writer.error, redis.exceptions.ResponseError)
+        self.assertFalse(writer.is_alive())
+        self.assertEqual(writer.stored.fetched, 0)
+
+        items = self.conn.lrange('items', 0, -1)
+        self.assertListEqual(items, [])
+
+
 class TestExecuteJob(TestBaseRQ):
     """Unit tests for execute_perceval_job"""
 
@@ -512,7 +858,7 @@ class TestExecuteJob(TestBaseRQ):
         self.assertEqual(result.summary.max_offset, None)
 
         commits = self.conn.lrange('items', 0, -1)
-        commits = [pickle.loads(c) for c in commits]
+        commits = [deserialize_item(c) for c in commits]
         commits = [(commit['job_id'], commit['data']['commit']) for commit in commits]
 
         expected = ['456a68ee1407a77f3e804a30dff245bb6c6b872f',
@@ -530,6 +876,28 @@ class TestExecuteJob(TestBaseRQ):
             self.assertEqual(item[0], result.job_id)
             self.assertEqual(item[1], expected[x])
 
+    def test_job_debug_logs(self):
+        """Check whether debug messages are logged when the level is enabled"""
+
+        backend_args = {
+            'uri': 'http://example.com/',
+            'gitpath': os.path.join(self.dir, 'data/git_log.txt')
+        }
+
+        q = rq.Queue('queue', is_async=False)  # noqa: W606
+
+        with self.assertLogs('arthur.jobs', level='DEBUG') as cm:
+            job = q.enqueue(execute_perceval_job,
+                            backend='git', backend_args=backend_args, category='commit',
+                            qitems='items', task_id='mytask', job_number=8)
+
+        job_id = job.get_id()
+        expected = [
+            'DEBUG:arthur.jobs:Running job #%s (task: mytask) (git) (cat:commit)' % job_id,
+            'DEBUG:arthur.jobs:Job #%s (task: mytask) completed (git) - 9/0 items (commit) fetched' % job_id
+        ]
+        self.assertListEqual(cm.output, expected)
+
     @httpretty.activate
     def test_failed_job(self):
         """Test if a failed job produce items an a partial result"""
@@ -570,7 +938,7 @@ class TestExecuteJob(TestBaseRQ):
         self.assertEqual(result.summary.max_offset, None)
 
         issues = self.conn.lrange('items', 0, -1)
-        issues = [pickle.loads(i) for i in issues]
+        issues = [deserialize_item(i) for i in issues]
         issues = [(issue['job_id'], issue['uuid']) for issue in issues]
         self.conn.ltrim('items', 1, 0)
 
@@ -613,7 +981,7 @@ class TestExecuteJob(TestBaseRQ):
         self.assertEqual(result.summary.max_offset, None)
 
         commits = self.conn.lrange('items', 0, -1)
-        commits = [pickle.loads(c) for c in commits]
+        commits = [deserialize_item(c) for c in commits]
         self.assertListEqual(commits, [])
 
     @httpretty.activate
@@ -651,7 +1019,7 @@ class TestExecuteJob(TestBaseRQ):
                         archive_args=archive_args)
 
         bugs = self.conn.lrange('items', 0, -1)
-        bugs = [pickle.loads(b) for b in bugs]
+        bugs = [deserialize_item(b) for b in bugs]
         bugs = [bug['uuid'] for bug in bugs]
         self.conn.ltrim('items', 1, 0)
 
@@ -682,7 +1050,7 @@ class TestExecuteJob(TestBaseRQ):
                         archive_args=archive_args)
 
         archived_bugs = self.conn.lrange('items', 0, -1)
-        archived_bugs = [pickle.loads(b) for b in archived_bugs]
+        archived_bugs = [deserialize_item(b) for b in archived_bugs]
         archived_bugs = [bug['uuid'] for bug in archived_bugs]
         self.conn.ltrim('items', 1, 0)
 
@@ -31,17 +31,24 @@ from redis.exceptions import RedisError
 
 from perceval.backend import Summary
 
-from arthur.common import Q_CREATION_JOBS, Q_RETRYING_JOBS
+from arthur.common import (ITEMS_BATCH_SIZE,
+                           ITEMS_FLUSH_INTERVAL,
+                           ITEMS_SERIALIZER,
+                           Q_CREATION_JOBS,
+                           Q_RETRYING_JOBS,
+                           Q_STORAGE_ITEMS)
 from arthur.errors import NotFoundError
 from arthur.events import JobEventType, JobEvent
-from arthur.jobs import JobResult
+from arthur.jobs import JobResult, PercevalJob, _ItemsWriter
 from arthur.scheduler import (_TaskScheduler,
+                              _build_job_arguments,
                               CompletedJobHandler,
                               FailedJobHandler,
                               StartedJobHandler,
                               Scheduler)
 from arthur.tasks import (ArchivingTaskConfig,
                           SchedulingTaskConfig,
+                          Task,
                           TaskRegistry,
                           TaskStatus)
 
@@ -828,6 +835,43 @@ class TestFailedJobHandler(TestBaseRQ):
         self.assertEqual(task.backend_args['next_offset'], 1000)
         self.assertEqual(task.num_failures, 1)
 
+    def test_failed_task_rescheduled_after_storage_error(self):
+        """Check if failed tasks are resumed after the items stored in the queue"""
+
+        handler = FailedJobHandler(self.task_scheduler)
+
+        scheduler_opts = SchedulingTaskConfig(delay=0, max_retries=3)
+        _ = self.registry.add('mytask', 'git', 'commit', {}, scheduling_cfg=scheduler_opts)
+
+        job = PercevalJob('1234567890', 1, 'mytask', 'git', 'commit',
+                          self.conn, 'items')
+        args = {
+            'uri': 'http://example.com/',
+            'gitpath': os.path.join(self.dir, 'data/git_log.txt')
+        }
+
+        # Storage fails when the first batch is sent
+        with unittest.mock.patch.object(_ItemsWriter, '_flush', side_effect=RedisError):
+            with self.assertRaises(RedisError):
+                job.run(args, batch_size=3)
+
+        payload = {
+            'error': "Error",
+            'result': job.result
+        }
+        event = JobEvent(JobEventType.FAILURE, 0, 'mytask', payload)
+
+        handled = handler(event)
+        self.assertEqual(handled, True)
+
+        # No items were stored, so the task is not resumed
+        # after the items fetched before the error
+        task = self.registry.get('mytask')
+        self.assertEqual(task.status, TaskStatus.SCHEDULED)
+        self.assertNotIn('next_from_date', task.backend_args)
+        self.assertNotIn('next_offset', task.backend_args)
+        self.assertEqual(task.num_failures, 1)
+
     def test_failed_task_rescheduled_no_new_items(self):
         """Check if tasks are rescheduled when no items where generated before"""
 
@@ -877,5 +921,60 @@ class TestFailedJobHandler(TestBaseRQ):
         self.assertEqual(handled, False)
 
 
+class TestBuildJobArguments(unittest.TestCase):
+    """Unit tests for _build_job_arguments function"""
+
+    def test_build_job_arguments(self):
+        """Check if the arguments of a job are built from a task"""
+
+        backend_args = {
+            'uri': 'http://example.com/',
+            'next_from_date': datetime.datetime(2016, 1, 1, tzinfo=UTC),
+            'next_offset': 100
+        }
+        sched_cfg = SchedulingTaskConfig(batch_size=10, max_flush_interval=1,
+                                         serializer='pickle')
+        task = Task('mytask', 'git', 'commit', backend_args,
+                    scheduling_cfg=sched_cfg)
+
+        job_args = _build_job_arguments(task)
+
+        expected = {
+            'qitems': Q_STORAGE_ITEMS,
+            'task_id': 'mytask',
+            'backend': 'git',
+            'backend_args': {
+                'uri': 'http://example.com/',
+                'from_date': datetime.datetime(2016, 1, 1, tzinfo=UTC),
+                'offset': 100
+            },
+            'category': 'commit',
+            'archive_args': None,
+            'batch_size': 10,
+            'max_flush_interval': 1,
+            'serializer': 'pickle'
+        }
+        self.assertDictEqual(job_args, expected)
+
+        # Task arguments are not modified
+        self.assertIn('next_from_date', task.backend_args)
+        self.assertIn('next_offset', task.backend_args)
+
+    def test_build_job_arguments_defaults(self):
+        """Check if default values are set when the task has no config"""
+
+        backend_args = {
+            'uri': 'http://example.com/'
+        }
+        task = Task('mytask', 'git', 'commit', backend_args)
+
+        job_args = _build_job_arguments(task)
+
+        self.assertDictEqual(job_args['backend_args'], backend_args)
+        self.assertEqual(job_args['batch_size'], ITEMS_BATCH_SIZE)
+        self.assertEqual(job_args['max_flush_interval'], ITEMS_FLUSH_INTERVAL)
+        self.assertEqual(job_args['serializer'], ITEMS_SERIALIZER)
+
+
 if __name__ == "__main__":
     unittest.main()
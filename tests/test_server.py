@@ -305,7 +305,10 @@ class TestArthurServer(TestBaseRQ):
                     'delay': 10,
                     'max_retries': 3,
                     'max_age': None,
-                    'queue': None
+                    'queue': None,
+                    'batch_size': 128,
+                    'max_flush_interval': 0.25,
+                    'serializer': 'msgpack'
                 }
             }
 
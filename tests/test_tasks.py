@@ -21,13 +21,23 @@
 #
 
 import datetime
+import pickle
 import unittest
 import unittest.mock
 
 import dateutil
 from redis.exceptions import RedisError
 
-from arthur.common import MAX_JOB_RETRIES, WAIT_FOR_QUEUING
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from arthur.common import (ITEMS_BATCH_SIZE,
+                           ITEMS_FLUSH_INTERVAL,
+                           ITEMS_SERIALIZER,
+                           MAX_JOB_RETRIES,
+                           WAIT_FOR_QUEUING)
 from arthur.errors import (AlreadyExistsError,
                            NotFoundError,
                            TaskRegistryError)
@@ -186,7 +196,10 @@ class TestTask(unittest.TestCase):
                 'delay': 10,
                 'max_retries': 2,
                 'max_age': 5,
-                'queue': 'myqueue'
+                'queue': 'myqueue',
+                'batch_size': ITEMS_BATCH_SIZE,
+                'max_flush_interval': ITEMS_FLUSH_INTERVAL,
+                'serializer': ITEMS_SERIALIZER
             }
         }
 
@@ -657,13 +670,21 @@ class TestSchedulingTaskConfig(unittest.TestCase):
         self.assertEqual(scheduling_cfg.max_retries, MAX_JOB_RETRIES)
         self.assertEqual(scheduling_cfg.max_age, None)
         self.assertEqual(scheduling_cfg.queue, None)
+        self.assertEqual(scheduling_cfg.batch_size, ITEMS_BATCH_SIZE)
+        self.assertEqual(scheduling_cfg.max_flush_interval, ITEMS_FLUSH_INTERVAL)
+        self.assertEqual(scheduling_cfg.serializer, ITEMS_SERIALIZER)
 
         scheduling_cfg = SchedulingTaskConfig(delay=5, max_retries=1,
-                                              max_age=10, queue='myqueue')
+                                              max_age=10, queue='myqueue',
+                                              batch_size=50, max_flush_interval=2,
+                                              serializer='pickle')
         self.assertEqual(scheduling_cfg.delay, 5)
         self.assertEqual(scheduling_cfg.max_retries, 1)
         self.assertEqual(scheduling_cfg.max_age, 10)
         self.assertEqual(scheduling_cfg.queue, 'myqueue')
+        self.assertEqual(scheduling_cfg.batch_size, 50)
+        self.assertEqual(scheduling_cfg.max_flush_interval, 2)
+        self.assertEqual(scheduling_cfg.serializer, 'pickle')
 
     def test_set_delay(self):
         """Test if delay property can be set"""
@@ -768,6 +789,111 @@ class TestSchedulingTaskConfig(unittest.TestCase):
 
         self.assertEqual(scheduling_cfg.queue, 'myqueue')
 
+    def test_set_batch_size(self):
+        """Test if batch_size property can be set"""
+
+        scheduling_cfg = SchedulingTaskConfig(batch_size=10)
+        self.assertEqual(scheduling_cfg.batch_size, 10)
+
+        scheduling_cfg.batch_size = 1
+        self.assertEqual(scheduling_cfg.batch_size, 1)
+
+    def test_set_invalid_batch_size(self):
+        """Check if an exception is raised for invalid batch_size values"""
+
+        with self.assertRaises(ValueError):
+            _ = SchedulingTaskConfig(batch_size=2.0)
+
+        scheduling_cfg = SchedulingTaskConfig(batch_size=10)
+
+        with self.assertRaises(ValueError):
+            scheduling_cfg.batch_size = 0
+
+        with self.assertRaises(ValueError):
+            scheduling_cfg.batch_size = -1
+
+        with self.assertRaises(ValueError):
+            scheduling_cfg.batch_size = None
+
+        with self.assertRaises(ValueError):
+            scheduling_cfg.batch_size = '5'
+
+        self.assertEqual(scheduling_cfg.batch_size, 10)
+
+    def test_set_max_flush_interval(self):
+        """Test if max_flush_interval property can be set"""
+
+        scheduling_cfg = SchedulingTaskConfig(max_flush_interval=1)
+        self.assertEqual(scheduling_cfg.max_flush_interval, 1)
+
+        scheduling_cfg.max_flush_interval = 0.5
+        self.assertEqual(scheduling_cfg.max_flush_interval, 0.5)
+
+        scheduling_cfg.max_flush_interval = 0
+        self.assertEqual(scheduling_cfg.max_flush_interval, 0)
+
+    def test_set_invalid_max_flush_interval(self):
+        """Check if an exception is raised for invalid max_flush_interval values"""
+
+        with self.assertRaises(ValueError):
+            _ = SchedulingTaskConfig(max_flush_interval='1')
+
+        scheduling_cfg = SchedulingTaskConfig(max_flush_interval=1)
+
+        with self.assertRaises(ValueError):
+            scheduling_cfg.max_flush_interval = -1
+
+        with self.assertRaises(ValueError):
+            scheduling_cfg.max_flush_interval = None
+
+        with self.assertRaises(ValueError):
+            scheduling_cfg.max_flush_interval = True
+
+        self.assertEqual(scheduling_cfg.max_flush_interval, 1)
+
+    def test_set_serializer(self):
+        """Test if serializer property can be set"""
+
+        scheduling_cfg = SchedulingTaskConfig(serializer='msgpack')
+        self.assertEqual(scheduling_cfg.serializer, 'msgpack')
+
+        scheduling_cfg.serializer = 'pickle'
+        self.assertEqual(scheduling_cfg.serializer, 'pickle')
+
+    @unittest.skipIf(not orjson, "orjson not installed")
+    def test_set_serializer_orjson(self):
+        """Test if orjson serializer can be set when it is installed"""
+
+        scheduling_cfg = SchedulingTaskConfig(serializer='orjson')
+        self.assertEqual(scheduling_cfg.serializer, 'orjson')
+
+    @unittest.mock.patch('arthur.utils.orjson', None)
+    def test_set_serializer_orjson_not_available(self):
+        """Check if orjson serializer can be set when it is not installed on the server"""
+
+        scheduling_cfg = SchedulingTaskConfig(serializer='orjson')
+        self.assertEqual(scheduling_cfg.serializer, 'orjson')
+
+        scheduling_cfg = SchedulingTaskConfig(serializer='pickle')
+        scheduling_cfg.serializer = 'orjson'
+        self.assertEqual(scheduling_cfg.serializer, 'orjson')
+
+    def test_set_invalid_serializer(self):
+        """Check if an exception is raised for invalid serializer values"""
+
+        with self.assertRaisesRegex(ValueError, "'serializer' must be one of msgpack, orjson, pickle"):
+            _ = SchedulingTaskConfig(serializer='marshal')
+
+        scheduling_cfg = SchedulingTaskConfig(serializer='pickle')
+
+        with self.assertRaises(ValueError):
+            scheduling_cfg.serializer = None
+
+        with self.assertRaises(ValueError):
+            scheduling_cfg.serializer = 1
+
+        self.assertEqual(scheduling_cfg.serializer, 'pickle')
+
     def test_from_dict(self):
         """Check if an object is created when its properties are given from a dict"""
 
@@ -834,11 +960,44 @@ class TestSchedulingTaskConfig(unittest.TestCase):
             'delay': 5,
             'max_retries': 1,
             'max_age': 5,
-            'queue': 'myqueue'
+            'queue': 'myqueue',
+            'batch_size': ITEMS_BATCH_SIZE,
+            'max_flush_interval': ITEMS_FLUSH_INTERVAL,
+            'serializer': ITEMS_SERIALIZER
         }
 
         self.assertDictEqual(d, expected)
 
+    def test_unpickle_previous_version(self):
+        """Check whether configurations stored by previous versions are loaded"""
+
+        scheduling_cfg = SchedulingTaskConfig(delay=5, max_retries=1,
+                                              max_age=5, queue='myqueue')
+
+        # Previous versions did not store these attributes
+        del scheduling_cfg._batch_size
+        del scheduling_cfg._max_flush_interval
+        del scheduling_cfg._serializer
+
+        scheduling_cfg = pickle.loads(pickle.dumps(scheduling_cfg))
+
+        self.assertEqual(scheduling_cfg.delay, 5)
+        self.assertEqual(scheduling_cfg.max_retries, 1)
+        self.assertEqual(scheduling_cfg.max_age, 5)
+        self.assertEqual(scheduling_cfg.queue, 'myqueue')
+        self.assertEqual(scheduling_cfg.batch_size, ITEMS_BATCH_SIZE)
+        self.assertEqual(scheduling_cfg.max_flush_interval, ITEMS_FLUSH_INTERVAL)
+        self.assertEqual(scheduling_cfg.serializer, ITEMS_SERIALIZER)
+
+        # Stored values are not replaced by the defaults
+        scheduling_cfg = SchedulingTaskConfig(batch_size=10, max_flush_interval=1,
+                                              serializer='pickle')
+        scheduling_cfg = pickle.loads(pickle.dumps(scheduling_cfg))
+
+        self.assertEqual(scheduling_cfg.batch_size, 10)
+        self.assertEqual(scheduling_cfg.max_flush_interval, 1)
+        self.assertEqual(scheduling_cfg.serializer, 'pickle')
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -23,11 +23,24 @@
 import copy
 import datetime
 import json
+import pickle
 import threading
 import time
 import unittest
+import unittest.mock
 
-from arthur.utils import RWLock, JSONEncoder
+import msgpack
+from dateutil.tz import UTC
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from arthur.utils import (RWLock,
+                          JSONEncoder,
+                          item_serializer,
+                          deserialize_item)
 
 
 class RWLockThread(threading.Thread):
@@ -177,5 +190,140 @@ class TestJSONEncoder(unittest.TestCase):
         self.assertEqual(result, obj)
 
 
+class TestItemSerializer(unittest.TestCase):
+    """Unit tests for item_serializer and deserialize_item functions"""
+
+    def setUp(self):
+        self.item = {
+            'uuid': '1375b60d3c23ac9b81da92523e4144abc4489d4c',
+            'updated_on': 1344965413.0,
+            'offset': None,
+            'data': {
+                'commit': 'bc57a9209f096a130dcc5ba7089a8663f758a703',
+                'files': [{'file': 'README', 'added': 1}],
+                'refs': []
+            },
+            'fetched_on': datetime.datetime(2016, 1, 1, 8, 8, 8, tzinfo=UTC)
+        }
+
+    def test_msgpack(self):
+        """Test whether items are serialized with msgpack by default"""
+
+        data = item_serializer()(self.item)
+        self.assertEqual(msgpack.unpackb(data, raw=False, timestamp=3), self.item)
+
+        item = deserialize_item(data)
+        self.assertDictEqual(item, self.item)
+
+    def test_msgpack_non_str_keys(self):
+        """Test whether items with non-string keys are read back"""
+
+        item = {'uuid': 'A', 'data': {1: 'x', 2.5: 'y'}}
+
+        data = item_serializer()(item)
+        self.assertNotEqual(data[:1], b'\x80')
+        self.assertDictEqual(deserialize_item(data), item)
+
+    def test_msgpack_fallback(self):
+        """Test whether items not supported by msgpack are pickled"""
+
+        items = [
+            {'uuid': 'A', 'data': {'tags': {'a'}}},
+            {'uuid': 'B', 'data': {'date': datetime.datetime(2016, 1, 1, 8, 8, 8)}},
+            {'uuid': 'C', 'data': {'id': 2 ** 64}}
+        ]
+
+        # The same packer is used after every failure
+        dumps = item_serializer()
+
+        for item in items:
+            data = dumps(item)
+            self.assertEqual(data[:2], b'\x80\x04')
+            self.assertDictEqual(deserialize_item(data), item)
+
+            data = dumps(self.item)
+            self.assertNotEqual(data[:1], b'\x80')
+            self.assertDictEqual(deserialize_item(data), self.item)
+
+    def test_pickle(self):
+        """Test whether items are serialized with pickle"""
+
+        data = item_serializer('pickle')(self.item)
+        self.assertEqual(pickle.loads(data), self.item)
+
+        item = deserialize_item(data)
+        self.assertDictEqual(item, self.item)
+
+    def test_item_serializer(self):
+        """Test whether the serializer function can be called many times"""
+
+        items = [self.item, {'uuid': 'B', 'data': {}}, {}]
+
+        for serializer in ['msgpack', 'pickle']:
+            dumps = item_serializer(serializer)
+            data = [dumps(item) for item in items]
+            self.assertListEqual([deserialize_item(d) for d in data], items)
+
+    def test_pickle_protocol(self):
+        """Test whether items are pickled using the protocol 4"""
+
+        data = item_serializer('pickle')(self.item)
+        self.assertEqual(data[:2], b'\x80\x04')
+
+    @unittest.skipIf(not orjson, "orjson not installed")
+    def test_orjson(self):
+        """Test whether items are serialized with orjson"""
+
+        data = item_serializer('orjson')(self.item)
+        self.assertEqual(data[:1], b'{')
+
+        # Datetimes are converted to strings
+        expected = copy.deepcopy(self.item)
+        expected['fetched_on'] = '2016-01-01T08:08:08+00:00'
+
+        item = deserialize_item(data)
+        self.assertDictEqual(item, expected)
+
+        # Without orjson installed, JSON items are still read
+        with unittest.mock.patch('arthur.utils.orjson', None):
+            item = deserialize_item(data)
+        self.assertDictEqual(item, expected)
+
+    @unittest.skipIf(not orjson, "orjson not installed")
+    def test_orjson_fallback(self):
+        """Test whether items not supported by JSON are pickled"""
+
+        item = {'uuid': 'A', 'data': {'tags': {'a'}}}
+
+        data = item_serializer('orjson')(item)
+        self.assertEqual(data[:2], b'\x80\x04')
+        self.assertDictEqual(deserialize_item(data), item)
+
+    @unittest.mock.patch('arthur.utils.orjson', None)
+    def test_orjson_not_available(self):
+        """Test whether items are serialized with msgpack when orjson is not installed"""
+
+        with self.assertLogs('arthur.utils', level='WARNING') as cm:
+            dumps = item_serializer('orjson')
+        self.assertRegex(cm.output[0], "'orjson' serializer is not available")
+
+        data = dumps(self.item)
+        self.assertEqual(msgpack.unpackb(data, raw=False, timestamp=3), self.item)
+        self.assertDictEqual(deserialize_item(data), self.item)
+
+    def test_empty_item(self):
+        """Test whether empty items are serialized and deserialized"""
+
+        for serializer in ['msgpack', 'pickle']:
+            data = item_serializer(serializer)({})
+            self.assertDictEqual(deserialize_item(data), {})
+
+    def test_unknown_serializer(self):
+        """Test whether it raises an exception when the serializer is not supported"""
+
+        with self.assertRaisesRegex(ValueError, "unknown 'marshal' serializer"):
+            item_serializer('marshal')
+
+
 if __name__ == "__main__":
     unittest.main()